@@ -28,8 +28,8 @@
 import re
 
 from .readers import plink, impute2, dataframe, bgen, dict_based, vcf
-from .core import (Genotypes, Variant, ImputedVariant, SplitChromosomeReader,
-                   Chromosome)
+from .core import (Genotypes, PackedGenotypes, Variant, ImputedVariant,
+                   SplitChromosomeReader, Chromosome)
 from .extract.extractor import Extractor
 
 try:
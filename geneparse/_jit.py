@@ -0,0 +1,57 @@
+"""Optional (lazy) compilation of the genotype kernels using numba."""
+
+# This file is part of geneparse.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2017 Pharmacogenomics Centre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import functools
+from importlib.util import find_spec
+
+
+# numba is only imported when a kernel is first called (importing it takes a
+# while, and most of the package doesn't need it)
+NUMBA_AVAILABLE = find_spec("numba") is not None
+
+
+def njit(**options):
+    """Compiles the decorated function using numba.njit on its first call.
+
+    The kernels should only be called when NUMBA_AVAILABLE is True.
+
+    """
+    def decorator(f):
+        compiled = None
+
+        @functools.wraps(f)
+        def wrapper(*args):
+            nonlocal compiled
+            if compiled is None:
+                import numba
+                compiled = numba.njit(**options)(f)
+
+            return compiled(*args)
+
+        return wrapper
+
+    return decorator
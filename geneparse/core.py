@@ -26,6 +26,7 @@
 
 
 import io
+import sys
 
 import numpy as np
 
@@ -38,6 +39,12 @@ VALID_CHROMOSOMES = set(
 
 _NUCLEOTIDE_COMPLEMENT = {"A": "T", "T": "A", "C": "G", "G": "C"}
 
+# PLINK's binary encoding (number of coded alleles to 2-bit code and back).
+# The missing value is encoded as 0b01.
+_PACKED_CODES = np.array([0b11, 0b10, 0b00], dtype=np.uint8)
+_PACKED_DOSAGES = np.array([2, np.nan, 1, 0])
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
 
 class Chromosome(object):
     __slots__ = ("name")
@@ -65,7 +72,7 @@ UNKNOWN_CHROMOSOME = Chromosome("?")
 class Variant(object):
     # Subclasses should declare a __slots__ containing only the additional
     # slots.
-    __slots__ = ("name", "chrom", "pos", "alleles")
+    __slots__ = ("name", "chrom", "pos", "alleles", "_hash")
 
     def __init__(self, name, chrom, pos, alleles):
         self.name = str(name) if name is not None else None
@@ -74,6 +81,10 @@ class Variant(object):
 
         self.alleles = self._encode_alleles(alleles)
 
+        # The hash is computed (and cached) on first use. Methods modifying
+        # the chromosome, the position or the alleles need to reset it.
+        self._hash = None
+
     @staticmethod
     def _encode_chr(chrom):
         # Accept instances of Chromosome as is (useful for contigs or non
@@ -100,7 +111,7 @@ class Variant(object):
     def _encode_alleles(iterable):
         if iterable is None:
             return None
-        return tuple(sorted(str(s).upper() for s in iterable))
+        return tuple(sorted(sys.intern(str(s).upper()) for s in iterable))
 
     def copy(self):
         return Variant(self.name, self.chrom, self.pos, self.alleles)
@@ -113,7 +124,9 @@ class Variant(object):
         # Two variants will have the same hash if they have the same
         # chromosome and position and **exactly the same alleles**.
         # Is this the behaviour we want?
-        return hash((self.chrom, self.pos, self.alleles))
+        if self._hash is None:
+            self._hash = hash((self.chrom, self.pos, self.alleles))
+        return self._hash
 
     def alleles_ambiguous(self):
         return self.alleles == ("C", "G") or self.alleles == ("A", "T")
@@ -148,6 +161,7 @@ class Variant(object):
         self.alleles = self._encode_alleles(
             [complement_alleles(i) for i in self.alleles]
         )
+        self._hash = None
 
     def __eq__(self, other):
         """Tests for the equality between two variants.
@@ -169,6 +183,27 @@ class Variant(object):
         return "<{} chr{}:{}_{}>".format(self.__class__.__name__, self.chrom,
                                          self.pos, self.alleles)
 
+    def __getstate__(self):
+        # The cached hash is not serialized, since string hashes differ
+        # between Python processes.
+        return {
+            field: getattr(self, field)
+            for cls in type(self).__mro__
+            for field in getattr(cls, "__slots__", ())
+            if field != "_hash"
+        }
+
+    def __setstate__(self, state):
+        # Objects pickled before the hash was cached used the default
+        # (dict, slots) state.
+        if isinstance(state, tuple):
+            state = state[1]
+
+        for field, value in state.items():
+            setattr(self, field, value)
+
+        self._hash = None
+
 
 class ImputedVariant(Variant):
     __slots__ = ("quality", )
@@ -305,6 +340,77 @@ class Genotypes(object):
         return state
 
 
+class PackedGenotypes(Genotypes):
+    __slots__ = ("packed", "n_samples")
+
+    def __init__(self, variant, genotypes, reference, coded, multiallelic):
+        """Genotypes stored as hard calls using 2 bits per sample.
+
+        The layout is the same as PLINK's binary files (with the coded allele
+        as the first allele), so that flipping the coding and computing the
+        allele frequency are done using bitwise operations on the packed
+        array. Only hard calls (0, 1, 2 or NaN) can be represented.
+
+        """
+        super().__init__(variant, genotypes, reference, coded, multiallelic)
+
+    @property
+    def genotypes(self):
+        return unpack_genotypes(self.packed, self.n_samples)
+
+    @genotypes.setter
+    def genotypes(self, genotypes):
+        self.packed = pack_genotypes(genotypes)
+        self.n_samples = len(genotypes)
+
+    def copy(self):
+        return PackedGenotypes(
+            self.variant, self.genotypes, self.reference, self.coded,
+            self.multiallelic
+        )
+
+    def flip_coded(self):
+        """Flips the coding of the alleles."""
+        # Homozygous codes (0b00 and 0b11) are swapped, the heterozygous and
+        # missing codes (0b10 and 0b01) are left as-is.
+        x = self.packed
+        m = ~(x ^ (x >> 1)) & np.uint8(0x55)
+        x ^= m | (m << 1)
+
+        # The padding of the last byte should stay at 0b00.
+        remainder = self.n_samples % 4
+        if remainder:
+            x[-1] &= np.uint8((1 << (2 * remainder)) - 1)
+
+        self.reference, self.coded = self.coded, self.reference
+
+    def coded_freq(self):
+        """Gets the frequency of the coded allele."""
+        x = self.packed
+        nb_missing = int(_POPCOUNT[x & ~(x >> 1) & np.uint8(0x55)].sum())
+        nb_called = self.n_samples - nb_missing
+        if nb_called == 0:
+            return np.nan
+
+        # Each code's bit count is its number of reference alleles (the
+        # padding counts for nothing, and the missing code for one).
+        nb_reference = int(_POPCOUNT[x].sum()) - nb_missing
+
+        return (2 * nb_called - nb_reference) / (2 * nb_called)
+
+    def __setstate__(self, state):
+        for field in Genotypes.__slots__ + self.__slots__:
+            if field != "genotypes":
+                setattr(self, field, state[field])
+
+    def __getstate__(self):
+        return {
+            field: getattr(self, field)
+            for field in Genotypes.__slots__ + self.__slots__
+            if field != "genotypes"
+        }
+
+
 class SplitChromosomeReader(object):
     def __init__(self, chrom_to_reader):
         """Reader to handle genotype access using files split by chromosome.
@@ -506,6 +612,52 @@ def complement_alleles(s):
     return s.translate(trans)[::-1]
 
 
+def pack_genotypes(genotypes):
+    """Packs hard calls using 2 bits per sample (PLINK's binary layout).
+
+    Args:
+        genotypes (numpy.array): The number of coded alleles (0, 1, 2 or NaN).
+
+    Returns:
+        numpy.array: The packed genotypes (uint8, 4 samples per byte).
+
+    """
+    genotypes = np.asarray(genotypes, dtype=float)
+    missing = np.isnan(genotypes)
+    calls = np.where(missing, 0, genotypes)
+
+    if not np.all(np.isin(calls, (0, 1, 2))):
+        raise ValueError("Only hard calls (0, 1, 2 or NaN) can be packed.")
+
+    codes = _PACKED_CODES[calls.astype(np.intp)]
+    codes[missing] = 0b01
+
+    # Padding to a multiple of 4 samples (with 0b00, as PLINK does).
+    padded = np.zeros(-(-codes.shape[0] // 4) * 4, dtype=np.uint8)
+    padded[:codes.shape[0]] = codes
+    padded = padded.reshape(-1, 4)
+
+    return (
+        padded[:, 0] | (padded[:, 1] << 2) | (padded[:, 2] << 4) |
+        (padded[:, 3] << 6)
+    )
+
+
+def unpack_genotypes(packed, n):
+    """Unpacks genotypes packed using `pack_genotypes`.
+
+    Args:
+        packed (numpy.array): The packed genotypes.
+        n (int): The number of samples.
+
+    Returns:
+        numpy.array: The number of coded alleles (with NaN if missing).
+
+    """
+    codes = (packed[:, np.newaxis] >> np.array([0, 2, 4, 6], np.uint8)) & 3
+    return _PACKED_DOSAGES[codes.ravel()[:n]]
+
+
 def _np_eq(a, b):
     nan_a = np.isnan(a)
     nan_b = np.isnan(b)
@@ -26,6 +26,7 @@
 
 
 from ..core import Variant, ImputedVariant, Genotypes, GenotypesReader
+from .._jit import NUMBA_AVAILABLE, njit
 
 import numpy as np
 
@@ -37,16 +38,29 @@ except ImportError:
 
 
 class VCFReader(GenotypesReader):
-    def __init__(self, filename, quality_field=None):
+    def __init__(self, filename, quality_field=None, threads=None):
         if not CYVCF2_AVAILABLE:
             raise RuntimeError(
                 "cyvcf2 is not installed. Install cyvcf2 (from source or "
                 "using `pip install cyvcf2`) to use the VCF reader."
             )
 
-        self.get_vcf = lambda: VCF(filename)
+        # Iterations get their own handle (so that they don't interfere with
+        # the random access one), and the header is parsed only once. The
+        # genotype types (gts012) are strict, so that a partially missing
+        # genotype is missing (like in _make_genotypes).
+        def get_vcf():
+            return VCF(filename, gts012=True, strict_gt=True, lazy=True,
+                       threads=threads)
+
+        self.get_vcf = get_vcf
+        self._vcf = get_vcf()
+        self._samples = self._vcf.samples
         self.quality_field = quality_field
 
+    def close(self):
+        self._vcf.close()
+
     def __repr__(self):
         # Impossible to know the number of variants without reading the
         # complete file... so we only show the number of samples...
@@ -63,7 +77,10 @@ class VCFReader(GenotypesReader):
 
         """
         for v in self.get_vcf():
-            alleles = {v.REF} | set(v.ALT)
+            # cyvcf2 creates new objects each time the attributes are accessed
+            ref, alt = v.REF, v.ALT
+            multiallelic = len(alt) > 1
+            alleles = {ref} | set(alt)
 
             if self.quality_field:
                 variant = ImputedVariant(v.ID, v.CHROM, v.POS, alleles,
@@ -71,33 +88,45 @@ class VCFReader(GenotypesReader):
             else:
                 variant = Variant(v.ID, v.CHROM, v.POS, alleles)
 
-            for coded_allele, g in self._make_genotypes(v.ALT, v.genotypes):
-                yield Genotypes(variant, g, v.REF, coded_allele,
-                                multiallelic=len(v.ALT) > 1)
+            for coded_allele, g in self._record_genotypes(v, alt):
+                yield Genotypes(variant, g, ref, coded_allele,
+                                multiallelic=multiallelic)
 
-    @staticmethod
-    def _make_genotypes(alleles, genotypes):
-        out = []
-        for allele_symbol, allele in enumerate(alleles):
-            variant_geno = np.empty(len(genotypes))
+    @classmethod
+    def _record_genotypes(cls, v, alt):
+        """Computes the dosage vectors of all the alternative alleles."""
+        # The genotype types would silently count haploid calls as
+        # homozygous, so the ploidy is checked for all sites
+        if v.ploidy != 2:
+            raise ValueError("only diploid genotypes are supported")
 
-            for i, g in enumerate(genotypes):
-                variant_geno[i] = 0
-                a1, a2, phase = g
+        if len(alt) == 1:
+            # Biallelic sites have the number of alternative alleles already
+            return [(alt[0], cls._make_biallelic_genotypes(v.gt_types))]
 
-                if a1 == -1 or a2 == -1:
-                    variant_geno[i] = np.nan
-                    continue
+        return cls._make_genotypes(alt, v.genotypes)
 
-                if a1 == allele_symbol + 1:
-                    variant_geno[i] += 1
+    @staticmethod
+    def _make_biallelic_genotypes(gt_types):
+        # The genotype types are 0, 1, 2 (number of ALT alleles) or 3 if
+        # missing (using gts012).
+        dosage = np.array(gt_types, dtype=np.float64)
+        dosage[dosage == 3] = np.nan
+        return dosage
 
-                if a2 == allele_symbol + 1:
-                    variant_geno[i] += 1
+    @staticmethod
+    def _make_genotypes(alleles, genotypes):
+        # The genotypes are [allele_1, allele_2, phased] (-1 if missing).
+        genotypes = np.asarray(genotypes, dtype=np.int16)
+        if genotypes.ndim != 2 or genotypes.shape[1] != 3:
+            raise ValueError("only diploid genotypes are supported")
 
-            out.append((allele, variant_geno))
+        if NUMBA_AVAILABLE:
+            dosage = _decode_genotypes_numba(genotypes, len(alleles))
+        else:
+            dosage = _decode_genotypes(genotypes, len(alleles))
 
-        return out
+        return list(zip(alleles, dosage))
 
     def iter_variants(self):
         """Iterate over marker information."""
@@ -105,46 +134,95 @@ class VCFReader(GenotypesReader):
             yield Variant(v.ID, v.CHROM, v.POS, {v.REF} | set(v.ALT))
 
     def get_variant_genotypes(self, variant):
-        region = self.get_vcf()(
+        region = self._vcf(
             "{}:{}-{}".format(variant.chrom, variant.pos, variant.pos)
         )
         genotypes = []
 
+        # The alleles of the variant (uppercase) are looked up in each record
+        variant_alleles = (
+            None if variant.alleles is None else frozenset(variant.alleles)
+        )
+
         for v in region:
-            for coded_allele, g in self._make_genotypes(v.ALT, v.genotypes):
-                alleles = {v.REF, coded_allele}
-                match = (
-                    variant.alleles is None or
-                    alleles.issubset(set(variant.alleles))
-                )
-
-                if match:
-                    genotypes.append(Genotypes(
-                        Variant(v.ID, v.CHROM, v.POS, alleles),
-                        g, v.REF, coded_allele,
-                        multiallelic=len(v.ALT) > 1,
-                    ))
+            ref, alt = v.REF, v.ALT
+            if variant_alleles is not None and \
+                    ref.upper() not in variant_alleles:
+                continue
+
+            multiallelic = len(alt) > 1
+            for coded_allele, g in self._record_genotypes(v, alt):
+                if variant_alleles is not None and \
+                        coded_allele.upper() not in variant_alleles:
+                    continue
+
+                genotypes.append(Genotypes(
+                    Variant(v.ID, v.CHROM, v.POS, {ref, coded_allele}),
+                    g, ref, coded_allele,
+                    multiallelic=multiallelic,
+                ))
 
         return genotypes
 
     def get_variants_in_region(self, chrom, start, end):
         """Iterate over variants in a region."""
-        region = self.get_vcf()(
-            "{}:{}-{}".format(chrom, start, end)
-        )
+        # This is a generator, so it gets its own handle (other queries on
+        # the shared one would move the file position under it)
+        region = self.get_vcf()("{}:{}-{}".format(chrom, start, end))
         for v in region:
-            for coded_allele, g in self._make_genotypes(v.ALT, v.genotypes):
-                variant = Variant(
-                    v.ID, v.CHROM, v.POS, [v.REF, coded_allele]
-                )
-                yield Genotypes(variant, g, v.REF, coded_allele,
-                                multiallelic=len(v.ALT) > 1)
+            ref, alt = v.REF, v.ALT
+            multiallelic = len(alt) > 1
+            for coded_allele, g in self._record_genotypes(v, alt):
+                variant = Variant(v.ID, v.CHROM, v.POS, [ref, coded_allele])
+                yield Genotypes(variant, g, ref, coded_allele,
+                                multiallelic=multiallelic)
 
     def get_samples(self):
-        return self.get_vcf().samples
+        return self._samples
 
     def get_number_samples(self):
         return len(self.get_samples())
 
     def get_number_variants(self):
         raise NotImplementedError("Don't know how to do this using cyvcf2.")
+
+
+def _decode_genotypes(genotypes, nb_alleles):
+    """Computes the dosage of each alternative allele.
+
+    Args:
+        genotypes (numpy.array): The (samples x 3) genotype array from cyvcf2.
+        nb_alleles (int): The number of alternative alleles.
+
+    Returns:
+        numpy.array: The (alleles x samples) dosage matrix (NaN if missing).
+
+    """
+    a1 = genotypes[:, 0]
+    a2 = genotypes[:, 1]
+
+    # All the alternative alleles are computed at once (one row per allele,
+    # so that each allele's genotypes are contiguous).
+    codes = np.arange(1, nb_alleles + 1)[:, np.newaxis]
+    dosage = (a1 == codes).astype(float) + (a2 == codes)
+    dosage[:, (a1 < 0) | (a2 < 0)] = np.nan
+
+    return dosage
+
+
+@njit(cache=True, nogil=True)
+def _decode_genotypes_numba(genotypes, nb_alleles):
+    """Numba version of _decode_genotypes (no temporary arrays)."""
+    nb_samples = genotypes.shape[0]
+    dosage = np.empty((nb_alleles, nb_samples), dtype=np.float64)
+
+    for i in range(nb_samples):
+        a1 = genotypes[i, 0]
+        a2 = genotypes[i, 1]
+        for j in range(nb_alleles):
+            if a1 < 0 or a2 < 0:
+                dosage[j, i] = np.nan
+            else:
+                dosage[j, i] = (a1 == j + 1) + (a2 == j + 1)
+
+    return dosage
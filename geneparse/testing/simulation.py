@@ -25,26 +25,27 @@
 # THE SOFTWARE.
 
 
-import random
-
 import numpy as np
 
 from ..core import Variant, Genotypes
 
 
-def simulate_genotypes_for_variant(variant, coded, coded_freq, n, call_rate=1):
+def simulate_genotypes_for_variant(variant, coded, coded_freq, n, call_rate=1,
+                                   rng=None):
     if variant.alleles is None or len(variant.alleles) != 2:
         raise ValueError(
             "Can only simulate genotypes for biallelic variants (with defined "
             "alleles)."
         )
 
+    if rng is None:
+        rng = np.random.default_rng()
+
     # Simulate genotypes.
-    g = np.random.binomial(2, coded_freq, size=n).astype(float)
+    g = rng.binomial(2, coded_freq, size=n).astype(float)
 
     if call_rate < 1:
-        missings = np.random.binomial(1, 1 - call_rate, size=n).astype(bool)
-        g[missings] = np.nan
+        g[rng.random(n) > call_rate] = np.nan
 
     return Genotypes(
         variant=variant,
@@ -55,15 +56,18 @@ def simulate_genotypes_for_variant(variant, coded, coded_freq, n, call_rate=1):
     )
 
 
-def simulate_genotypes(coded_freq, n, call_rate=1):
+def simulate_genotypes(coded_freq, n, call_rate=1, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+
     v = Variant(
         "simulated",
-        random.randint(1, 22),
-        random.randint(12345, 99999999),
-        random.sample("ATGC", 2)
+        rng.integers(1, 23),
+        rng.integers(12345, 100000000),
+        rng.choice(list("ATGC"), 2, replace=False)
     )
 
     coded_allele = v.alleles_set.pop()
 
     return simulate_genotypes_for_variant(v, coded_allele, coded_freq, n,
-                                          call_rate)
+                                          call_rate, rng)
@@ -0,0 +1,49 @@
+"""Helpers shared by the tests."""
+
+# This file is part of geneparse.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2017 Pharmacogenomics Centre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import importlib
+import os
+
+import numpy as np
+
+
+def _data(*parts, package=__package__):
+    """Returns the path of a file in a package's test 'data' directory."""
+    module = importlib.import_module(package)
+    return os.path.join(os.path.dirname(module.__file__), "data", *parts)
+
+
+def _eq(a, b):
+    """Asserts that two arrays are equal (NaN values compare as equal)."""
+    if a.shape == b.shape and np.array_equal(a, b, equal_nan=True):
+        return
+
+    # Failed, so we use numpy's helper for a detailed message.
+    np.testing.assert_array_equal(a, b)
+    raise AssertionError(
+        "Arrays have different shapes ({} != {}).".format(a.shape, b.shape)
+    )
@@ -25,25 +25,20 @@
 # THE SOFTWARE.
 
 
-import os
 import random
 import unittest
 
-from pkg_resources import resource_filename
-
 import numpy as np
 
 from pybgen.tests.truths import truths
 
 from ..readers import bgen
 from ..core import Variant
+from ._utils import _data
 from .generic_tests import TestContainer
 
 
-BGEN_FILE = resource_filename(
-    "pybgen.tests",
-    os.path.join("data", "example.8bits.bgen"),
-)
+BGEN_FILE = _data("example.8bits.bgen", package="pybgen.tests")
 
 
 class TestBGEN(TestContainer, unittest.TestCase):
@@ -0,0 +1,165 @@
+"""Tests for the genotype calls comparison tool."""
+
+# This file is part of geneparse.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2017 Pharmacogenomics Centre
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import os
+import logging
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ..core import Variant, Genotypes, PackedGenotypes
+from ..readers.dict_based import DictBasedReader
+from ..tools import compare_calls
+from ..tools.compare_calls import compare, count_match_mismatch
+
+
+logging.disable(logging.CRITICAL)
+
+
+class TestCompareCalls(unittest.TestCase):
+    def setUp(self):
+        v1 = Variant("rs1", 1, 1234, "AG")
+        v2 = Variant("rs2", 2, 2345, "CT")
+
+        # The samples of the second container are in reverse order (and
+        # sample s0 is not in the second container)
+        self.reader1 = DictBasedReader({
+            "rs1": Genotypes(v1, np.array([0, 0, np.nan, 2, 0, 1]), "A", "G",
+                             False),
+            "rs2": Genotypes(v2, np.array([1, 0, 1, 2, 2, 0]), "C", "T",
+                             False),
+        }, ["s0", "s1", "s2", "s3", "s4", "s5"])
+
+        # rs2 is coded using the other allele
+        self.reader2 = DictBasedReader({
+            "rs1": Genotypes(v1.copy(), np.array([2, np.nan, 1.1, 1.4, 0.2]),
+                             "A", "G", False),
+            "rs2": Genotypes(v2.copy(), np.array([2, 0, 1, 1, 2]), "T", "C",
+                             False),
+        }, ["s5", "s4", "s3", "s2", "s1"])
+
+        self.tmp_dir = tempfile.TemporaryDirectory(prefix="geneparse_test_")
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp_dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def test_compare(self):
+        """Tests the comparison between two genotype containers."""
+        for index_reader2 in (False, True):
+            with self.subTest(index_reader2=index_reader2):
+                compare(self.reader1, self.reader2, index_reader2)
+                self._check_compare_calls()
+
+    def _check_compare_calls(self):
+        observed = pd.read_csv("compare_calls.csv").set_index("name")
+        self.assertEqual(["rs1 / rs1", "rs2 / rs2"], list(observed.index))
+
+        # rs1: s1 matches, s3 (rounded dosage) and s5 mismatch, s2 and s4 are
+        # missing
+        rs1 = observed.loc["rs1 / rs1"]
+        self.assertEqual(
+            ["1", 1234, "A", "G", 3, 1, 2, 1, 1],
+            [str(rs1.chrom)] + rs1.iloc[1:].tolist(),
+        )
+
+        # rs2: all samples match except s3 (after flipping)
+        rs2 = observed.loc["rs2 / rs2"]
+        self.assertEqual(
+            ["2", 2345, "C", "T", 5, 4, 1, 0, 0],
+            [str(rs2.chrom)] + rs2.iloc[1:].tolist(),
+        )
+
+    def test_index_by_position(self):
+        """Tests the lookup of the genotypes indexed by position."""
+        lookup = compare_calls._index_by_position(self.reader2)
+
+        for variant in (Variant("rs1", 1, 1234, "AG"),
+                        Variant("rs1", 1, 1234, None),
+                        Variant("rs1", 1, 1234, "AT"),
+                        Variant("rs3", 1, 3456, "AG")):
+            with self.subTest(variant=variant, alleles=variant.alleles):
+                expected = self.reader2.get_variant_genotypes(variant)
+                observed = lookup(variant)
+                self.assertEqual(
+                    [(g.variant, g.reference, g.coded) for g in expected],
+                    [(g.variant, g.reference, g.coded) for g in observed],
+                )
+
+    def test_count_match_mismatch_invalid(self):
+        """Tests comparing variants with different alleles."""
+        g1 = next(self.reader1.iter_genotypes())
+        g2 = Genotypes(Variant("rs1", 1, 1234, "AT"), np.array([0, 1, 2]),
+                       "A", "T", False)
+        idx = np.arange(3)
+
+        with self.assertRaises(ValueError):
+            count_match_mismatch(g1, idx, g2, idx)
+
+    def test_count_match_mismatch_packed(self):
+        """Tests comparing packed genotypes."""
+        idx1 = np.array([5, 4, 3, 2, 1])
+        idx2 = np.arange(5)
+
+        counts = {}
+        for container in (Genotypes, PackedGenotypes):
+            g1, g2 = (
+                reader.get_variant_by_name("rs2")[0]
+                for reader in (self.reader1, self.reader2)
+            )
+            genotypes_2 = g2.genotypes.astype(float)
+            genotypes_2[0] = np.nan
+
+            g1 = container(g1.variant, g1.genotypes, g1.reference, g1.coded,
+                           False)
+            g2 = container(g2.variant, genotypes_2, g2.reference, g2.coded,
+                           False)
+            counts[container] = count_match_mismatch(g1, idx1, g2, idx2)
+
+        self.assertEqual(
+            {"n": 4, "match": 3, "mismatch": 1, "missing_1": 0,
+             "missing_2": 1},
+            counts[PackedGenotypes],
+        )
+        self.assertEqual(counts[Genotypes], counts[PackedGenotypes])
+
+    @unittest.skipIf(not compare_calls.NUMBA_AVAILABLE,
+                     "numba is not installed")
+    def test_count_numba(self):
+        """Tests that the numba and numpy implementations agree."""
+        rng = np.random.default_rng(42)
+        g1, g2 = rng.integers(0, 3, size=(2, 1001)).astype(float)
+        g1[rng.random(1001) < 0.1] = np.nan
+        g2[rng.random(1001) < 0.1] = np.nan
+
+        self.assertEqual(compare_calls._count(g1, g2),
+                         compare_calls._count_numba(g1, g2))
+
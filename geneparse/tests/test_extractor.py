@@ -30,14 +30,15 @@ import logging
 
 import numpy as np
 
+from ._utils import _eq
 from .test_plink import PLINK_PREFIX
 from .truth import genotypes as truth_genotypes
 from .truth import variants as truth_variants
 from ..extract.extractor import Extractor
-from ..core import complement_alleles
+from ..core import Variant, complement_alleles
 from ..readers.plink import PlinkReader
 from ..readers.dict_based import DictBasedReader
-from ..testing.simulation import simulate_genotypes
+from ..testing.simulation import simulate_genotypes_for_variant
 
 
 logging.disable(logging.CRITICAL)
@@ -48,37 +49,41 @@ class TestExtractor(unittest.TestCase):
     def setUpClass(cls):
         cls.reader_f = lambda x: PlinkReader(PLINK_PREFIX)
 
+    def _check_extracted(self, results):
+        """Compares the extracted genotypes with the truth in bulk."""
+        truths = [truth_genotypes[g.variant.name] for g in results]
+
+        self.assertEqual(
+            [(g.variant, g.reference, g.coded) for g in results],
+            [(t.variant, t.reference, t.coded) for t in truths],
+        )
+        _eq(
+            np.stack([g.genotypes for g in results]),
+            np.stack([t.genotypes for t in truths]),
+        )
+
     def test_extract_by_name(self):
         """Tests the extraction using variants name."""
         to_extract = {"rs785467", "rs140543381"}
-        reader = self.reader_f()
-        extractor = Extractor(reader, names=to_extract)
-
-        seen = set()
-        for genotype in extractor.iter_genotypes():
-            name = genotype.variant.name
-            truth = truth_genotypes[name]
-            seen.add(name)
+        with self.reader_f() as reader:
+            extractor = Extractor(reader, names=to_extract)
 
-            self.assertEqual(genotype.variant, truth.variant)
-            self.assertEqual(genotype.reference, truth.reference)
-            self.assertEqual(genotype.coded, truth.coded)
-            np.testing.assert_array_equal(genotype.genotypes, truth.genotypes)
-
-        self.assertEqual(seen, to_extract)
-        reader.close()
+            results = list(extractor.iter_genotypes())
+            self.assertEqual({g.variant.name for g in results}, to_extract)
+            self._check_extracted(results)
 
     def test_extract_missing_variant(self):
         """Tests extracting a missing variant."""
         n = 100
-        ambiguous = None
-        non_ambiguous = None
-        while ambiguous is None or non_ambiguous is None:
-            g = simulate_genotypes(0.1, n, 0.95)
-            if ambiguous is None and g.variant.alleles_ambiguous():
-                ambiguous = g
-            elif non_ambiguous is None and not g.variant.alleles_ambiguous():
-                non_ambiguous = g
+        rng = np.random.default_rng(42)
+        ambiguous = simulate_genotypes_for_variant(
+            Variant("ambiguous", 1, 1234, "AT"), "T", 0.1, n, 0.95, rng,
+        )
+        non_ambiguous = simulate_genotypes_for_variant(
+            Variant("non_ambiguous", 1, 2345, "AC"), "C", 0.1, n, 0.95, rng,
+        )
+        self.assertTrue(ambiguous.variant.alleles_ambiguous())
+        self.assertFalse(non_ambiguous.variant.alleles_ambiguous())
 
         reader = DictBasedReader({}, ["s{}".format(i + 1) for i in range(n)])
 
@@ -93,35 +98,26 @@ class TestExtractor(unittest.TestCase):
 
     def test_extract_by_variant(self):
         """Tests the extraction using variants object."""
-        to_extract = {
+        to_extract = frozenset({
             truth_variants["rs785467"],
             truth_variants["rs140543381"]
-        }
-        reader = self.reader_f()
-        extractor = Extractor(reader, variants=to_extract)
-
-        seen = set()
-        for genotype in extractor.iter_genotypes():
-            truth = truth_genotypes[genotype.variant.name]
-            seen.add(genotype.variant)
+        })
+        with self.reader_f() as reader:
+            extractor = Extractor(reader, variants=to_extract)
 
-            self.assertEqual(genotype.variant, truth.variant)
-            self.assertEqual(genotype.reference, truth.reference)
-            self.assertEqual(genotype.coded, truth.coded)
-            np.testing.assert_array_equal(genotype.genotypes, truth.genotypes)
-
-        self.assertEqual(seen, to_extract)
-        reader.close()
+            results = list(extractor.iter_genotypes())
+            self.assertEqual({g.variant for g in results}, to_extract)
+            self._check_extracted(results)
 
     def test_extract_by_variant_other_strand(self):
         """Test extracting a variant with the 'wrong' strand."""
         # DictBasedReader(name_to_genotypes, samples)
         # Simulate a non-ambiguous variant.
         n = 100
-        while True:
-            g = simulate_genotypes(0.1, n, 0.95)
-            if not g.variant.alleles_ambiguous():
-                break
+        g = simulate_genotypes_for_variant(
+            Variant("simulated", 1, 1234, "AC"), "C", 0.1, n, 0.95,
+            np.random.default_rng(42),
+        )
 
         reader = DictBasedReader(
             {"simulated": g}, ["s{}".format(i + 1) for i in range(n)]
@@ -137,7 +133,7 @@ class TestExtractor(unittest.TestCase):
         complemented_g = results[0]
 
         # Make sure the coding is correct.
-        np.testing.assert_array_equal(g.genotypes, complemented_g.genotypes)
+        _eq(g.genotypes, complemented_g.genotypes)
 
         self.assertEqual(complemented_g.reference,
                          complement_alleles(g.reference))
@@ -149,22 +145,10 @@ class TestExtractor(unittest.TestCase):
     def test_multiple_extract(self):
         """Tests extracting twice (simulating a subgroup analysis)."""
         to_extract = {"rs785467", "rs140543381"}
-        reader = self.reader_f()
-        extractor = Extractor(reader, names=to_extract)
-
-        for i in range(2):
-            seen = set()
-            for genotype in extractor.iter_genotypes():
-                name = genotype.variant.name
-                truth = truth_genotypes[name]
-                seen.add(name)
-
-                self.assertEqual(genotype.variant, truth.variant)
-                self.assertEqual(genotype.reference, truth.reference)
-                self.assertEqual(genotype.coded, truth.coded)
-                np.testing.assert_array_equal(genotype.genotypes,
-                                              truth.genotypes)
-
-            self.assertEqual(seen, to_extract)
+        with self.reader_f() as reader:
+            extractor = Extractor(reader, names=to_extract)
 
-        reader.close()
+            for i in range(2):
+                results = list(extractor.iter_genotypes())
+                self.assertEqual({g.variant.name for g in results}, to_extract)
+                self._check_extracted(results)
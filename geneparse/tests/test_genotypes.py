@@ -29,13 +29,17 @@ import unittest
 
 import numpy as np
 
-from ..core import Genotypes, Variant
+from ._utils import _eq
+from ..core import (Genotypes, PackedGenotypes, Variant, pack_genotypes,
+                    unpack_genotypes)
 
 
 class TestGenotypes(unittest.TestCase):
+    genotypes_class = Genotypes
+
     def setUp(self):
         # Creating a genotype object
-        self.g = Genotypes(
+        self.g = self.genotypes_class(
             variant=Variant("marker_1", 1, 1234, ["ACGCT", "C"]),
             genotypes=np.array([2, 2, 1, 2, 0, 1, 1, 1, np.nan, 0]),
             reference="ACGCT",
@@ -53,7 +57,7 @@ class TestGenotypes(unittest.TestCase):
         self.assertEqual(self.g.coded, "ACGCT")
 
         # Checking the genotypes changed
-        np.testing.assert_array_equal(
+        _eq(
             np.array([0, 0, 1, 0, 2, 1, 1, 1, np.nan, 2]),
             self.g.genotypes,
         )
@@ -75,7 +79,7 @@ class TestGenotypes(unittest.TestCase):
         self.assertEqual(self.g.coded, "G")
 
         # Checking the genotypes did not changed
-        np.testing.assert_array_equal(
+        _eq(
             np.array([2, 2, 1, 2, 0, 1, 1, 1, np.nan, 0]),
             self.g.genotypes,
         )
@@ -108,7 +112,7 @@ class TestGenotypes(unittest.TestCase):
         self.assertEqual(self.g.coded, "ACGCT")
 
         # Checking the genotypes changed
-        np.testing.assert_array_equal(
+        _eq(
             np.array([0, 0, 1, 0, 2, 1, 1, 1, np.nan, 2]),
             self.g.genotypes,
         )
@@ -122,7 +126,7 @@ class TestGenotypes(unittest.TestCase):
 
     def test_code_minor_has_no_effect(self):
         """Tests coding the genotypes to the minor allele (no need to flip)."""
-        other_g = Genotypes(
+        other_g = self.genotypes_class(
             variant=Variant("marker_1", 1, 1234, ["ACGCT", "C"]),
             genotypes=np.array([0, 0, 1, 0, 2, 1, 1, 1, np.nan, 2]),
             reference="ACGCT",
@@ -136,7 +140,7 @@ class TestGenotypes(unittest.TestCase):
         self.assertEqual(other_g.coded, "C")
 
         # Checking the genotypes changed
-        np.testing.assert_array_equal(
+        _eq(
             np.array([0, 0, 1, 0, 2, 1, 1, 1, np.nan, 2]),
             other_g.genotypes,
         )
@@ -147,3 +151,29 @@ class TestGenotypes(unittest.TestCase):
         self.assertEqual(1234, other_g.variant.pos)
         self.assertEqual(("ACGCT", "C"), other_g.variant.alleles)
         self.assertFalse(other_g.multiallelic)
+
+
+class TestPackedGenotypes(TestGenotypes):
+    genotypes_class = PackedGenotypes
+
+    def test_pack_unpack(self):
+        """Tests packing and unpacking genotypes (with padding)."""
+        genotypes = np.array([2, 2, 1, 2, 0, 1, 1, 1, np.nan, 0])
+        packed = pack_genotypes(genotypes)
+
+        self.assertEqual(packed.dtype, np.uint8)
+        self.assertEqual(packed.shape, (3, ))
+        _eq(genotypes, unpack_genotypes(packed, genotypes.shape[0]))
+
+    def test_pack_dosage(self):
+        """Tests packing dosage values (which is impossible)."""
+        with self.assertRaises(ValueError):
+            pack_genotypes(np.array([0, 1, 0.9, 2]))
+
+    def test_flip_coded_twice(self):
+        """Tests that flipping twice leaves the padding untouched."""
+        packed = self.g.packed.copy()
+        self.g.flip_coded()
+        self.g.flip_coded()
+
+        _eq(packed, self.g.packed)
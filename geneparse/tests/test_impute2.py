@@ -26,33 +26,70 @@
 
 
 import os
-import unittest
+import gzip
+import shutil
 import logging
+import tempfile
+import unittest
 
-from pkg_resources import resource_filename
-
+from ._utils import _data
 from .generic_tests import TestContainer
 from ..readers import impute2
+from ..index.impute2 import get_index
 
 
 logging.disable(logging.CRITICAL)
 
 
-IMPUTE2_FN = resource_filename(
-    __name__,
-    os.path.join("data", "impute2", "impute2_test.impute2.gz"),
-)
-IMPUTE2_SAMPLE_FN = resource_filename(
-    __name__,
-    os.path.join("data", "impute2", "impute2_test.sample"),
-)
+IMPUTE2_FN = _data("impute2", "impute2_test.impute2.gz")
+IMPUTE2_SAMPLE_FN = _data("impute2", "impute2_test.sample")
 
 
 # TODO: Add tests for actual dosage value (not just 100% probability)
 class TestImpute2(TestContainer, unittest.TestCase):
     @classmethod
     def setUpClass(cls):
+        # Decompressing (and indexing) the IMPUTE2 file once for all tests
+        cls.tmp_dir = tempfile.TemporaryDirectory(prefix="geneparse_test_")
+        cls.impute2_fn = os.path.join(cls.tmp_dir.name, "impute2_test.impute2")
+        with gzip.open(IMPUTE2_FN, "rb") as i_file, \
+                open(cls.impute2_fn, "wb") as o_file:
+            shutil.copyfileobj(i_file, o_file)
+
+        get_index(cls.impute2_fn, cols=[0, 1, 2],
+                  names=["chrom", "name", "pos"], sep=" ")
+
         cls.reader_f = lambda x: impute2.Impute2Reader(
+            filename=cls.impute2_fn,
+            sample_filename=IMPUTE2_SAMPLE_FN,
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_bgzip_file(self):
+        """Tests reading the original bgzip compressed file."""
+        bgzip_reader = impute2.Impute2Reader(
             filename=IMPUTE2_FN,
             sample_filename=IMPUTE2_SAMPLE_FN,
         )
+        with bgzip_reader as bgzip_f, self.reader_f() as f:
+            self.assertEqual(
+                list(bgzip_f.iter_genotypes()), list(f.iter_genotypes()),
+            )
+            self.assertEqual(bgzip_f.get_number_variants(),
+                             f.get_number_variants())
+
+            # The lookups seek in the bgzip file using the index
+            for name in ("rs785467", "rs146589823"):
+                self.assertEqual(f.get_variant_by_name(name),
+                                 bgzip_f.get_variant_by_name(name))
+                variant = f.get_variant_by_name(name)[0].variant
+                self.assertEqual(f.get_variant_genotypes(variant),
+                                 bgzip_f.get_variant_genotypes(variant))
+
+            self.assertEqual(
+                list(f.get_variants_in_region("1", 46521000, 46521600)),
+                list(bgzip_f.get_variants_in_region("1", 46521000, 46521600)),
+            )
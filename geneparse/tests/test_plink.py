@@ -25,12 +25,10 @@
 # THE SOFTWARE.
 
 
-import os
 import unittest
 import logging
 
-from pkg_resources import resource_filename
-
+from ._utils import _data
 from .generic_tests import TestContainer
 from ..readers import plink
 
@@ -38,10 +36,7 @@ from ..readers import plink
 logging.disable(logging.CRITICAL)
 
 
-PLINK_PREFIX = resource_filename(
-    __name__,
-    os.path.join("data", "plink", "btest"),
-)
+PLINK_PREFIX = _data("plink", "btest")
 
 
 class TestPlink(TestContainer, unittest.TestCase):
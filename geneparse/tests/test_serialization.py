@@ -25,8 +25,8 @@
 # THE SOFTWARE.
 
 
+import io
 import pickle
-import tempfile
 import unittest
 
 import numpy as np
@@ -40,8 +40,8 @@ class TestSerializer(unittest.TestCase):
         genotypes = np.array([0, 1, np.nan, 2, 0, 1, np.nan, 0, 0])
         g = Genotypes(v, genotypes, "C", "T", multiallelic=False)
 
-        with tempfile.TemporaryFile() as f:
-            pickle.dump(g, f)
+        with io.BytesIO() as f:
+            pickle.dump(g, f, protocol=pickle.HIGHEST_PROTOCOL)
 
             f.seek(0)
             recovered = pickle.load(f)
@@ -60,8 +60,8 @@ class TestSerializer(unittest.TestCase):
         genotypes = np.array([0, 1, np.nan, 2, 0, 1, np.nan, 0, 0])
         g = Genotypes(v, genotypes, "C", "T", multiallelic=False)
 
-        with tempfile.TemporaryFile() as f:
-            pickle.dump(g, f)
+        with io.BytesIO() as f:
+            pickle.dump(g, f, protocol=pickle.HIGHEST_PROTOCOL)
 
             f.seek(0)
             recovered = pickle.load(f)
@@ -73,8 +73,8 @@ class TestSerializer(unittest.TestCase):
         genotypes = np.random.binomial(2, 0.1, size=100000)
         g = Genotypes(v, genotypes, "T", "C", multiallelic=False)
 
-        with tempfile.TemporaryFile() as f:
-            pickle.dump(g, f)
+        with io.BytesIO() as f:
+            pickle.dump(g, f, protocol=pickle.HIGHEST_PROTOCOL)
 
             f.seek(0)
             recovered = pickle.load(f)
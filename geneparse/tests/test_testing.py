@@ -27,6 +27,8 @@
 
 import unittest
 
+import numpy as np
+
 from .. import testing
 from ..core import Variant, Genotypes
 
@@ -37,6 +39,19 @@ class TestTesting(unittest.TestCase):
 
         self.assertTrue(isinstance(g, Genotypes))
 
+    def test_simulate_genotypes_seeded(self):
+        g1 = testing.simulate_genotypes(
+            0.1, 1000, call_rate=0.9, rng=np.random.default_rng(42),
+        )
+        g2 = testing.simulate_genotypes(
+            0.1, 1000, call_rate=0.9, rng=np.random.default_rng(42),
+        )
+
+        self.assertEqual(g1.variant, g2.variant)
+        self.assertEqual(g1.coded, g2.coded)
+        np.testing.assert_array_equal(g1.genotypes, g2.genotypes)
+        self.assertTrue(np.isnan(g1.genotypes).any())
+
     def test_simulate_genotypes_for_variant(self):
         v = Variant("my_variant", 1, 1234, "AT")
         g = testing.simulate_genotypes_for_variant(v, "T", 0.2, 1000)
@@ -24,25 +24,47 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import io
 import os
-import random
+import json
+import tempfile
+import urllib.error
 import unittest
+from unittest import mock
 
 import numpy as np
 import pandas as pd
 
-from pkg_resources import resource_filename
-
+from ._utils import _data
 from ..testing.simulation import simulate_genotypes
 from .. import utils
 from ..core import Variant, Genotypes
 from ..readers.plink import PlinkReader
 
 
+SAMPLES = tuple("sample{}".format(i + 1) for i in range(100))
+
+
 class TestUtils(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # The simulated genotypes are shared (read only) by the tests
+        cls.g = simulate_genotypes(0.2, 100, call_rate=1)
+        cls.g_alleles = simulate_genotypes(0.4, 100, call_rate=1)
+        cls.samples = list(SAMPLES)
+
+        # Dosage values (the variant itself is irrelevant)
+        cls.dosage = Genotypes(
+            variant=Variant("dummy", 3, 1000000, ["A", "T"]),
+            genotypes=np.array([0.1, 0.8, 1.1, np.nan, 1.6, 2.0]),
+            reference="A",
+            coded="T",
+            multiallelic=False
+        )
+
     def test_genotype_to_df(self):
-        g = simulate_genotypes(0.2, 100, call_rate=1)
-        samples = ["sample{}".format(i + 1) for i in range(100)]
+        g = self.g
+        samples = self.samples
 
         # Convert to dataframe.
         df = utils.genotype_to_df(g, samples)
@@ -52,30 +74,26 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(samples, list(df.index))
 
     def test_genotype_to_df_no_name(self):
-        g = simulate_genotypes(0.2, 100, call_rate=1)
-        samples = ["sample{}".format(i + 1) for i in range(100)]
+        # The variant is modified, so we work on a copy
+        g = self.g.copy()
+        g.variant = g.variant.copy()
         g.variant.name = None
 
-        df = utils.genotype_to_df(g, samples)
+        df = utils.genotype_to_df(g, self.samples)
 
         self.assertEqual(df.columns, ["genotypes"])
 
     def test_genotype_to_df_alleles(self):
-        g = simulate_genotypes(0.4, 100, call_rate=1)
+        g = self.g_alleles
         ref_allele = g.reference
         alt_allele = g.coded
 
-        samples = ["sample{}".format(i + 1) for i in range(100)]
+        samples = self.samples
 
-        homo_ref = [
-            sample for sample, geno in zip(samples, g.genotypes) if geno == 0
-        ]
-        hetero = [
-            sample for sample, geno in zip(samples, g.genotypes) if geno == 1
-        ]
-        homo_coded = [
-            sample for sample, geno in zip(samples, g.genotypes) if geno == 2
-        ]
+        samples_arr = np.asarray(samples)
+        homo_ref = samples_arr[g.genotypes == 0].tolist()
+        hetero = samples_arr[g.genotypes == 1].tolist()
+        homo_coded = samples_arr[g.genotypes == 2].tolist()
 
         df = utils.genotype_to_df(g, samples, as_string=True)
 
@@ -96,23 +114,9 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(list(homo_min_alleles)[0], cc)
 
     def test_genotype_to_df_alleles_dosage(self):
-        v = Variant(
-            "dummy", random.randint(1, 22), random.randint(12345, 99999999),
-            random.sample("ATGC", 2)
-        )
-
-        coded_allele = v.alleles_set.pop()
-
-        geno = np.array([0.1, 0.8, 1.1, np.nan, 1.6, 2.0])
-        samples = ["sample{}".format(i + 1) for i in range(len(geno))]
-
-        geno = Genotypes(
-            variant=v,
-            genotypes=geno,
-            coded=coded_allele,
-            reference=(v.alleles_set - {coded_allele}).pop(),
-            multiallelic=False
-        )
+        geno = self.dosage
+        v = geno.variant
+        samples = list(SAMPLES[:len(geno.genotypes)])
 
         r = geno.reference
         c = geno.coded
@@ -132,6 +136,125 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(expected.columns, observed.columns)
         self.assertTrue(expected.equals(observed))
 
+    @unittest.skipIf(not utils.NUMBA_AVAILABLE, "numba is not installed")
+    def test_normalize_genotypes_numba(self):
+        """Tests that the numba and numpy normalizations agree."""
+        rng = np.random.default_rng(42)
+        random = rng.uniform(0, 2, size=1001)
+        random[rng.random(1001) < 0.1] = np.nan
+
+        cases = [
+            self.dosage.genotypes,
+            random,
+            1e4 + np.array([0.1, 0.2, 0.3]),    # Offset dosage
+            np.array([0.3, 0.3, np.nan, 0.3]),  # Constant marker
+        ]
+
+        for g in cases:
+            with self.subTest(g=g[:3]):
+                with np.errstate(invalid="ignore"):
+                    expected = (g - np.nanmean(g)) / np.nanstd(g)
+                    observed = utils.normalize_genotypes(
+                        Genotypes(self.dosage.variant, g, "A", "T", False),
+                    )
+                np.testing.assert_allclose(expected, observed)
+
+    def test_maf(self):
+        """Tests the MAF computation."""
+        g = self.dosage.genotypes
+        expected = 1 - np.nansum(g) / (2 * np.sum(~np.isnan(g)))
+
+        maf, minor_coded = utils.maf(self.dosage)
+        self.assertAlmostEqual(expected, maf)
+        self.assertFalse(minor_coded)
+
+    def test_rsids_to_variants(self):
+        """Tests the batching and caching of the Ensembl requests."""
+        def _fetch(li):
+            # rs3 has no mapping
+            return {
+                name: Variant(name, 1, int(name[2:]), "AG")
+                for name in li if name != "rs3"
+            }
+
+        rsids = ["rs{}".format(i + 1) for i in range(450)]
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                mock.patch.dict(utils._ensembl_cache, clear=True), \
+                mock.patch.object(utils, "_fetch_ensembl_variants",
+                                  side_effect=_fetch) as fetch:
+            cache_fn = os.path.join(tmp_dir, "ensembl")
+            variants = utils.rsids_to_variants(rsids, cache_fn=cache_fn)
+
+            self.assertEqual(449, len(variants))
+            self.assertNotIn("rs3", variants)
+            self.assertEqual(Variant("rs42", 1, 42, "AG"), variants["rs42"])
+            self.assertEqual(
+                [200, 200, 50],
+                sorted((len(c[0][0]) for c in fetch.call_args_list),
+                       reverse=True),
+            )
+
+            # The second time, everything comes from the cache
+            fetch.reset_mock()
+            self.assertEqual(variants, utils.rsids_to_variants(rsids))
+            fetch.assert_not_called()
+
+            # The same goes for a new session using the shelve
+            utils._ensembl_cache.clear()
+            self.assertEqual(
+                variants, utils.rsids_to_variants(rsids, cache_fn=cache_fn),
+            )
+            fetch.assert_not_called()
+
+    def test_fetch_ensembl_variants_rate_limited(self):
+        """Tests that rate limited requests to Ensembl are retried."""
+        data = json.dumps({"rs42": {"mappings": [{
+            "seq_region_name": "1", "start": 42, "allele_string": "A/G",
+            "assembly_name": "GRCh37",
+        }]}}).encode("utf-8")
+
+        response = mock.MagicMock()
+        response.__enter__.return_value = response
+        response.read.return_value = data
+        response.headers = {}
+
+        def _rate_limited(retry_after):
+            return urllib.error.HTTPError(
+                "url", 429, "Too Many Requests",
+                {"Retry-After": retry_after}, io.BytesIO(),
+            )
+
+        with mock.patch.object(utils.urllib.request, "urlopen") as urlopen, \
+                mock.patch.object(utils.time, "sleep") as sleep:
+            urlopen.side_effect = [
+                _rate_limited("2"), _rate_limited("0.5"), response,
+            ]
+            variants = utils._fetch_ensembl_variants(["rs42"])
+
+            self.assertEqual({"rs42": Variant("rs42", 1, 42, "AG")}, variants)
+            self.assertEqual([2, 0.5], [c[0][0] for c in sleep.call_args_list])
+
+            # The number of retries is bounded
+            urlopen.reset_mock()
+            urlopen.side_effect = [
+                _rate_limited("1")
+                for _ in range(utils._ENSEMBL_MAX_RETRIES + 1)
+            ]
+            with self.assertRaises(urllib.error.HTTPError):
+                utils._fetch_ensembl_variants(["rs42"])
+            self.assertEqual(utils._ENSEMBL_MAX_RETRIES + 1,
+                             urlopen.call_count)
+
+            # Other errors are not retried
+            urlopen.reset_mock()
+            urlopen.side_effect = urllib.error.HTTPError(
+                "url", 500, "Internal Server Error", {}, io.BytesIO(),
+            )
+            with self.assertRaises(urllib.error.HTTPError):
+                utils._fetch_ensembl_variants(["rs42"])
+            self.assertEqual(1, urlopen.call_count)
+
 
 class TestUtilsLD(unittest.TestCase):
     @staticmethod
@@ -153,27 +276,24 @@ class TestUtilsLD(unittest.TestCase):
             "SNP_B", verify_integrity=True,
         ).rename(columns={"R2": "expected_r2"}).expected_r2
 
-    def setUp(self):
+    @classmethod
+    def setUpClass(cls):
         # The prefix of the two datasets
-        prefix = resource_filename(
-            __name__,
-            os.path.join("data", "ld", "common_extracted_1kg"),
-        )
+        prefix = _data("ld", "common_extracted_1kg")
 
         # Retrieving the two datasets
-        self.rs1800775, self.others = self._read_data(prefix)
-        self.rs1800775_missing, self.others_missing = self._read_data(
+        cls.rs1800775, cls.others = cls._read_data(prefix)
+        cls.rs1800775_missing, cls.others_missing = cls._read_data(
             prefix + ".missing",
         )
+        cls.others_names = frozenset(g.variant.name for g in cls.others)
 
         # The prefix of the two LD files
-        prefix = resource_filename(
-            __name__, os.path.join("data", "ld", "plink_rs1800775_pairs"),
-        )
+        prefix = _data("ld", "plink_rs1800775_pairs")
 
         # Retrieving the two LD files
-        self.exp_ld = self._read_ld(prefix + ".ld")
-        self.exp_ld_missing = self._read_ld(prefix + ".missing.ld")
+        cls.exp_ld = cls._read_ld(prefix + ".ld")
+        cls.exp_ld_missing = cls._read_ld(prefix + ".missing.ld")
 
     def test_ld_computation(self):
         # Compute the LD
@@ -183,18 +303,18 @@ class TestUtilsLD(unittest.TestCase):
         self.assertEqual(ld_vector.shape[0], len(self.others))
 
         # Checking we have a value for each of the markers
-        self.assertEqual(
-            set(ld_vector.index), {g.variant.name for g in self.others},
-        )
+        self.assertEqual(set(ld_vector.index), self.others_names)
 
-        # Merging with the expected values
-        df = pd.DataFrame(
-            {"r2": ld_vector, "expected_r2": self.exp_ld},
+        # Only the marker itself is missing from the computed values
+        self.assertEqual(
+            len(ld_vector.index.union(self.exp_ld.index)) - 1,
+            ld_vector.shape[0],
         )
-        self.assertEqual(df.shape[0] - 1, ld_vector.shape[0])
 
         # Computing the square error (should be close to 0)
-        squared_error = np.nanmean((df.r2 - df.expected_r2) ** 2)
+        expected = self.exp_ld
+        observed = ld_vector.reindex(expected.index).values
+        squared_error = np.nanmean((observed - expected.values) ** 2)
         self.assertAlmostEqual(squared_error, 0)
 
     def test_ld_computation_with_na_values(self):
@@ -207,16 +327,16 @@ class TestUtilsLD(unittest.TestCase):
         self.assertEqual(ld_vector.shape[0], len(self.others))
 
         # Checking we have a value for each of the markers
-        self.assertEqual(
-            set(ld_vector.index), {g.variant.name for g in self.others},
-        )
+        self.assertEqual(set(ld_vector.index), self.others_names)
 
-        # Merging with the expected values
-        df = pd.DataFrame(
-            {"r2": ld_vector, "expected_r2": self.exp_ld_missing},
+        # Only the marker itself is missing from the computed values
+        self.assertEqual(
+            len(ld_vector.index.union(self.exp_ld_missing.index)) - 1,
+            ld_vector.shape[0],
         )
-        self.assertEqual(df.shape[0] - 1, ld_vector.shape[0])
 
         # Computing the square error (should be close to 0)
-        squared_error = np.nanmean((df.r2 - df.expected_r2) ** 2)
+        expected = self.exp_ld_missing
+        observed = ld_vector.reindex(expected.index).values
+        squared_error = np.nanmean((observed - expected.values) ** 2)
         self.assertAlmostEqual(squared_error, 0, places=5)
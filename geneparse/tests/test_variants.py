@@ -25,54 +25,43 @@
 # THE SOFTWARE.
 
 
+import pickle
 import unittest
 import logging
 
 from ..exceptions import InvalidChromosome
-from ..core import Variant, Chromosome, UNKNOWN_CHROMOSOME
+from ..core import Variant, ImputedVariant, Chromosome, UNKNOWN_CHROMOSOME
 
 
 logging.disable(logging.CRITICAL)
 
 
 class TestVariant(unittest.TestCase):
+    # name, chrom, pos, alleles, expected chrom, expected alleles
+    VALID_CASES = [
+        ("rs1234", 3, 1234, "AG", Chromosome(3), {"A", "G"}),
+        ("rs12345", "3", 23456, "TGA", Chromosome(3), {"T", "G", "A"}),
+        ("rs12345", "3", 23456, None, Chromosome(3), None),
+        ("rs12345", "chr3", 23456, "TGA", Chromosome(3), {"T", "G", "A"}),
+        ("rs12346", Chromosome("Unknown"), 123456, "TA",
+         Chromosome("Unknown"), {"T", "A"}),
+        ("rs12346", None, 123456, "TA", UNKNOWN_CHROMOSOME, {"T", "A"}),
+    ]
+
     def test_valid_variants(self):
         """Tests the creation of valid variants."""
-        var = Variant("rs1234", 3, 1234, "AG")
-        self.assertEqual("rs1234", var.name)
-        self.assertEqual(Chromosome(3), var.chrom)
-        self.assertEqual(1234, var.pos)
-        self.assertEqual({"A", "G"}, var.alleles_set)
-
-        var = Variant("rs12345", "3", 23456, "TGA")
-        self.assertEqual("rs12345", var.name)
-        self.assertEqual(Chromosome(3), var.chrom)
-        self.assertEqual(23456, var.pos)
-        self.assertEqual({"T", "G", "A"}, var.alleles_set)
-
-        var = Variant("rs12345", "3", 23456, None)
-        self.assertEqual("rs12345", var.name)
-        self.assertEqual(Chromosome(3), var.chrom)
-        self.assertEqual(23456, var.pos)
-        self.assertTrue(var.alleles_set is None)
-
-        var = Variant("rs12345", "chr3", 23456, "TGA")
-        self.assertEqual("rs12345", var.name)
-        self.assertEqual(Chromosome(3), var.chrom)
-        self.assertEqual(23456, var.pos)
-        self.assertEqual({"T", "G", "A"}, var.alleles_set)
-
-        var = Variant("rs12346", Chromosome("Unknown"), 123456, "TA")
-        self.assertEqual("rs12346", var.name)
-        self.assertEqual(Chromosome("Unknown"), var.chrom)
-        self.assertEqual(123456, var.pos)
-        self.assertEqual({"T", "A"}, var.alleles_set)
-
-        var = Variant("rs12346", None, 123456, "TA")
-        self.assertEqual("rs12346", var.name)
-        self.assertTrue(var.chrom is UNKNOWN_CHROMOSOME)
-        self.assertEqual(123456, var.pos)
-        self.assertEqual({"T", "A"}, var.alleles_set)
+        for name, chrom, pos, alleles, exp_chrom, exp_alleles in \
+                self.VALID_CASES:
+            with self.subTest(name=name, chrom=chrom, alleles=alleles):
+                var = Variant(name, chrom, pos, alleles)
+                self.assertEqual(name, var.name)
+                self.assertEqual(pos, var.pos)
+                self.assertEqual(exp_alleles, var.alleles_set)
+
+                if exp_chrom is UNKNOWN_CHROMOSOME:
+                    self.assertTrue(var.chrom is UNKNOWN_CHROMOSOME)
+                else:
+                    self.assertEqual(exp_chrom, var.chrom)
 
     def test_invalid_variant(self):
         """Tests the creation of invalid variants (e.g. invalid chrom)."""
@@ -112,3 +101,22 @@ class TestVariant(unittest.TestCase):
         v.complement_alleles()
         expected = set(["T", "C", "A", "Z"])
         self.assertEqual(v.alleles_set, expected)
+
+    def test_variant_hash_after_complement(self):
+        """Tests that the cached hash follows the alleles."""
+        v = Variant("rs1234", 1, 1234, "AG")
+        hash(v)
+        v.complement_alleles()
+        self.assertEqual(hash(v), hash(Variant("rs1234", 1, 1234, "TC")))
+
+    def test_variant_pickle(self):
+        """Tests that variants are hashed after being unpickled."""
+        v = ImputedVariant("rs1234", 1, 1234, "AG", 0.9)
+        hash(v)
+
+        recovered = pickle.loads(pickle.dumps(v))
+        self.assertTrue(recovered._hash is None)
+        self.assertEqual(v, recovered)
+        self.assertEqual(hash(v), hash(recovered))
+        self.assertEqual(v.name, recovered.name)
+        self.assertEqual(v.quality, recovered.quality)
@@ -25,12 +25,13 @@
 # THE SOFTWARE.
 
 
-import os
 import unittest
 import logging
+from unittest import mock
 
-from pkg_resources import resource_filename
+import numpy as np
 
+from ._utils import _data, _eq
 from .generic_tests import TestContainer
 from ..readers import vcf
 from . import truth
@@ -39,10 +40,7 @@ from . import truth
 logging.disable(logging.CRITICAL)
 
 
-VCF_FILE = resource_filename(
-    __name__,
-    os.path.join("data", "vcf", "test.vcf.gz"),
-)
+VCF_FILE = _data("vcf", "test.vcf.gz")
 
 VARIANT_NAME_FIX = {
     ("rs9628434", "T"): "subal_2_rs9628434",
@@ -56,6 +54,17 @@ class TestVCF(TestContainer, unittest.TestCase):
     def setUpClass(cls):
         cls.reader_f = lambda x: vcf.VCFReader(VCF_FILE)
 
+        # The variants and genotypes are read once for the iteration tests
+        with cls.reader_f() as f:
+            cls.variants = list(f.iter_variants())
+            cls.genotypes = list(f.iter_genotypes())
+
+    @staticmethod
+    def _expected_genotypes(g):
+        """Gets the truth for genotypes (handling multiallelic variants)."""
+        key = truth.variant_to_key[g.variant]
+        return truth.genotypes[VARIANT_NAME_FIX.get((key, g.coded), key)]
+
     def test_iter_variants(self):
         """Test that all variants are iterated over"""
         # We expect the variants in the same order as the BIM.
@@ -66,35 +75,19 @@ class TestVCF(TestContainer, unittest.TestCase):
             truth.variants["rs140543381"],
         ]
 
-        with self.reader_f() as f:
-            for i, v in enumerate(f.iter_variants()):
-                self.assertEqual(v, expected[i])
-
-        self.assertEqual(i, len(expected) - 1)  # All variants were iterated.
+        self.assertEqual(self.variants, expected)
 
     def test_iter_genotypes(self):
         """Test that the genotypes are read correctly"""
-        with self.reader_f() as f:
-            for g in f.iter_genotypes():
-                variant_name = VARIANT_NAME_FIX.get(
-                    (truth.variant_to_key[g.variant], g.coded),
-                    truth.variant_to_key[g.variant],
-                )
-
-                expected = truth.genotypes[variant_name]
-                self.assertEqual(expected, g)
+        for g in self.genotypes:
+            expected = self._expected_genotypes(g)
+            self.assertEqual(expected, g)
 
     def test_multiallelic_identifier(self):
         """Test that the multiallelic flag gets set when iterating"""
-        with self.reader_f() as f:
-            for g in f.iter_genotypes():
-                variant_name = VARIANT_NAME_FIX.get(
-                    (truth.variant_to_key[g.variant], g.coded),
-                    truth.variant_to_key[g.variant],
-                )
-
-                expected = truth.genotypes[variant_name]
-                self.assertEqual(expected.multiallelic, g.multiallelic)
+        for g in self.genotypes:
+            expected = self._expected_genotypes(g)
+            self.assertEqual(expected.multiallelic, g.multiallelic)
 
     def test_get_multiallelic_variant_by_locus(self):
         """Test getting a multiallelic variant using a locus."""
@@ -113,6 +106,25 @@ class TestVCF(TestContainer, unittest.TestCase):
 
         self.assertEqual(len(expected), 0)
 
+    def test_get_variants_in_region_interleaved(self):
+        """Tests region queries interleaved with other queries."""
+        with self.reader_f() as f:
+            region_1 = f.get_variants_in_region("1", 1, 100000000)
+            region_x = f.get_variants_in_region("X", 1, 100000000)
+
+            observed = [next(region_1), next(region_x)]
+            observed.extend(f.get_variant_genotypes(
+                truth.variants["rs146589823"],
+            ))
+            observed.extend(region_1)
+            observed.extend(region_x)
+
+        self.assertEqual(
+            [truth.genotypes[name] for name in ("rs785467", "rs140543381",
+                                                "rs146589823")],
+            observed,
+        )
+
     @unittest.skip("Not implemented")
     def test_get_variant_by_name(self):
         pass
@@ -124,3 +136,63 @@ class TestVCF(TestContainer, unittest.TestCase):
     @unittest.skip("Not implemented")
     def test_get_variant_by_name_invalid(self):
         pass
+
+
+class TestMakeGenotypes(unittest.TestCase):
+    def test_make_genotypes(self):
+        """Tests the conversion of cyvcf2 genotypes to dosage vectors."""
+        genotypes = [
+            [0, 0, False], [0, 1, True], [1, 1, True], [0, 2, False],
+            [2, 1, False], [-1, -1, False], [1, -1, True], [2, 2, True],
+        ]
+
+        observed = vcf.VCFReader._make_genotypes(["T", "A"], genotypes)
+        self.assertEqual(["T", "A"], [allele for allele, _ in observed])
+
+        na = np.nan
+        _eq(np.array([0, 1, 2, 0, 1, na, na, 0]), observed[0][1])
+        _eq(np.array([0, 0, 0, 1, 1, na, na, 2]), observed[1][1])
+
+    def test_make_genotypes_not_diploid(self):
+        """Tests that only diploid genotypes are converted."""
+        haploid = [[0, False], [1, True], [2, False]]
+        with self.assertRaises(ValueError):
+            vcf.VCFReader._make_genotypes(["T", "A"], haploid)
+
+        triploid = [[0, 1, 1, False], [1, 1, 2, True]]
+        with self.assertRaises(ValueError):
+            vcf.VCFReader._make_genotypes(["T", "A"], triploid)
+
+    def test_record_genotypes_not_diploid(self):
+        """Tests that haploid records are rejected at all sites."""
+        record = mock.Mock(
+            ploidy=1, gt_types=np.array([0, 2, 3]),
+            genotypes=[[0, False], [1, False], [-1, False]],
+        )
+        for alt in (["A"], ["A", "C"]):
+            with self.subTest(alt=alt):
+                with self.assertRaises(ValueError):
+                    vcf.VCFReader._record_genotypes(record, alt)
+
+        # The same genotypes, for diploid samples
+        record.ploidy = 2
+        observed = vcf.VCFReader._record_genotypes(record, ["A"])
+        self.assertEqual("A", observed[0][0])
+        _eq(np.array([0, 2, np.nan]), observed[0][1])
+
+    def test_make_biallelic_genotypes(self):
+        """Tests the conversion of cyvcf2 genotype types (gts012)."""
+        gt_types = np.array([0, 1, 2, 3, 1], dtype=np.int32)
+
+        observed = vcf.VCFReader._make_biallelic_genotypes(gt_types)
+        _eq(np.array([0, 1, 2, np.nan, 1]), observed)
+        self.assertEqual(np.float64, observed.dtype)
+
+    @unittest.skipIf(not vcf.NUMBA_AVAILABLE, "numba is not installed")
+    def test_decode_genotypes_numba(self):
+        """Tests that the numba and numpy implementations agree."""
+        genotypes = np.random.default_rng(42).integers(
+            -1, 4, size=(1001, 3), dtype=np.int16,
+        )
+        _eq(vcf._decode_genotypes(genotypes, 3),
+            vcf._decode_genotypes_numba(genotypes, 3))
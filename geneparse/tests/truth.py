@@ -43,6 +43,8 @@ Some conventions are used:
 # THE SOFTWARE.
 
 
+from types import MappingProxyType
+
 from ..core import Variant, Genotypes
 
 import numpy as np
@@ -82,24 +84,35 @@ variants = {
     "locus_rs140543381": Variant("rs140543381", "X", 89932529, None),
     "uk_rs140543381": Variant(None, "X", 89932529, ["A", "T"]),
 }
-variant_to_key = {v: strip_key(k) for k, v in variants.items()}
+
+# Read-only, since it is shared by all the test modules.
+variant_to_key = MappingProxyType(
+    {v: strip_key(k) for k, v in variants.items()}
+)
 
 # Genotypes -> variant, genotype, reference, coded.
 genotypes = {
     "rs785467": Genotypes(
-        variants["rs785467"], np.array([0, 1, 2, 0, 0]), "A", "T", False
+        variants["rs785467"], np.array([0, 1, 2, 0, 0], dtype=np.int8),
+        "A", "T", False
     ),
     "rs146589823": Genotypes(
-        variants["rs146589823"], np.array([2, 1, 0, 0, 0]), "CAGG", "C", False
+        variants["rs146589823"], np.array([2, 1, 0, 0, 0], dtype=np.int8),
+        "CAGG", "C", False
     ),
     "subal_2_rs9628434": Genotypes(
-        variants["subal_2_rs9628434"], np.array([1, 1, na, 0, 0]), "G", "T", True
+        variants["subal_2_rs9628434"],
+        np.array([1, 1, na, 0, 0], dtype=np.float32),
+        "G", "T", True
     ),
     "subal_3_rs9628434": Genotypes(
-        variants["subal_3_rs9628434"], np.array([1, 0, na, 1, 0]), "G", "A", True
+        variants["subal_3_rs9628434"],
+        np.array([1, 0, na, 1, 0], dtype=np.float32),
+        "G", "A", True
     ),
     "rs140543381": Genotypes(
-        variants["rs140543381"], np.array([1, 2, 0, 0, 1]), "A", "T", False
+        variants["rs140543381"], np.array([1, 2, 0, 0, 1], dtype=np.int8),
+        "A", "T", False
     )
 }
 
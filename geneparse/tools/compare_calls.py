@@ -25,31 +25,101 @@
 # THE SOFTWARE.
 
 
+from collections import defaultdict
+
 import numpy as np
 
+from .._jit import NUMBA_AVAILABLE, njit
 from ..utils import flip_alleles
 
 
-def compare(reader1, reader2):
+# The output's header and row template
+_HEADER = ("name,chrom,pos,a1,a2,n_samples,n_match,n_mismatch,n_missing_1,"
+           "n_missing_2\n")
+_ROW = "{} / {},{},{},{},{},{},{},{},{},{}\n"
+
+# The number of rows formatted before each write
+_WRITE_BATCH_SIZE = 4096
+
+# The counts computed by count_match_mismatch
+_COUNT_KEYS = ("n", "match", "mismatch", "missing_1", "missing_2")
+
+
+def compare(reader1, reader2, index_reader2=False):
+    """Compares the calls of the variants found in both readers.
+
+    Args:
+        reader1 (GenotypesReader): The first reader (iterated on).
+        reader2 (GenotypesReader): The second reader (queried for each of the
+                                   variants of the first one).
+        index_reader2 (bool): Read all the genotypes of the second reader
+                              once and index them by position, instead of
+                              querying it for each variant.
+
+    Note:
+        The index holds all the genotypes of the second reader in memory, so
+        it is only suitable when the second file is small. Also, only the
+        variants starting at the exact same position are matched (a region
+        query also returns, for example, a deletion starting before).
+
+    The results are written in 'compare_calls.csv'.
+
+    """
     samples1 = reader1.get_samples()
     samples2 = reader2.get_samples()
 
-    common_samples = list(set(samples1) & set(samples2))
-
-    sample_to_index_1 = {sample: i for i, sample in enumerate(samples1)}
+    # The indices of the common samples in both readers (in a single pass)
     sample_to_index_2 = {sample: i for i, sample in enumerate(samples2)}
+    idx1 = []
+    idx2 = []
+    for i, sample in enumerate(samples1):
+        j = sample_to_index_2.get(sample)
+        if j is not None:
+            idx1.append(i)
+            idx2.append(j)
+
+    idx1 = np.array(idx1, dtype=np.intp)
+    idx2 = np.array(idx2, dtype=np.intp)
+
+    # The reordered genotypes are written in buffers reused for all variants
+    g1_buf = np.empty(idx1.shape[0], dtype=np.float64)
+    g2_buf = np.empty(idx2.shape[0], dtype=np.float64)
 
-    idx1 = np.array((sample_to_index_1[s] for s in common_samples))
-    idx2 = np.array((sample_to_index_2[s] for s in common_samples))
+    with open("compare_calls.csv", "w", buffering=1 << 20) as f:
+        f.write(_HEADER)
 
-    f = open("compare_calls.csv", "w")
-    f.write("name,chrom,pos,a1,a2,n_samples,n_match,n_mismatch,n_missing_1,"
-            "n_missing_2\n")
+        # The rows are written in batches
+        buf = []
+        matching = _iter_matching(reader1, reader2, index_reader2)
+        for geno1, geno2 in matching:
+            counts = count_match_mismatch(geno1, idx1, geno2, idx2,
+                                          g1_buf, g2_buf)
+
+            buf.append(_ROW.format(
+                geno1.variant.name, geno2.variant.name,
+                geno1.variant.chrom, geno1.variant.pos,
+                geno1.reference, geno1.coded,
+                counts["n"], counts["match"], counts["mismatch"],
+                counts["missing_1"], counts["missing_2"],
+            ))
+
+            if len(buf) >= _WRITE_BATCH_SIZE:
+                f.write("".join(buf))
+                buf.clear()
+
+        f.write("".join(buf))
+
+
+def _iter_matching(reader1, reader2, index_reader2=False):
+    """Yields the pairs of genotypes found in both readers."""
+    get_variant_genotypes = reader2.get_variant_genotypes
+    if index_reader2:
+        get_variant_genotypes = _index_by_position(reader2)
 
     for geno1 in reader1.iter_genotypes():
 
         # Get the variant in reader2.
-        geno2 = reader2.get_variant_genotypes(geno1.variant)
+        geno2 = get_variant_genotypes(geno1.variant)
 
         if len(geno2) == 0:
             # Could not find variant in second container.
@@ -72,32 +142,43 @@ def compare(reader1, reader2):
             if not match:
                 continue
 
-        counts = count_match_mismatch(geno1, idx1, geno2, idx2)
+        yield geno1, geno2
+
 
-        f.write(",".join([str(i) for i in [
-            "{} / {}".format(geno1.variant.name, geno2.variant.name),
-            geno1.variant.chrom,
-            geno1.variant.pos,
-            geno1.reference,
-            geno1.coded,
-            counts["n"],
-            counts["match"],
-            counts["mismatch"],
-            counts["missing_1"],
-            counts["missing_2"],
-        ]]) + "\n")
+def _index_by_position(reader):
+    """Indexes all the genotypes of a reader by position.
 
-    f.close()
+    Returns:
+        function: A lookup with the same behaviour as the reader's
+        get_variant_genotypes.
 
+    """
+    index = defaultdict(list)
+    for g in reader.iter_genotypes():
+        index[(g.variant.chrom, g.variant.pos)].append(g)
 
-def count_match_mismatch(geno1, idx1, geno2, idx2):
+    def get_variant_genotypes(variant):
+        if variant.alleles is None:
+            return list(index.get((variant.chrom, variant.pos), ()))
+
+        alleles = frozenset(variant.alleles)
+        return [
+            g for g in index.get((variant.chrom, variant.pos), ())
+            if g.reference in alleles and g.coded in alleles
+        ]
+
+    return get_variant_genotypes
+
+
+def count_match_mismatch(geno1, idx1, geno2, idx2, g1_buf=None,
+                         g2_buf=None):
     if geno1.reference == geno2.reference and geno1.coded == geno2.coded:
         # Exact same variant.
         pass
 
     elif geno1.reference == geno2.coded and geno1.coded == geno2.reference:
-        # Requires flipping.
-        geno2 = flip_alleles(geno2)
+        # Requires flipping (on a copy, as the genotypes might be reused).
+        geno2 = flip_alleles(geno2.copy())
 
     else:
         # Variants do not match.
@@ -105,25 +186,76 @@ def count_match_mismatch(geno1, idx1, geno2, idx2):
             geno1.variant, geno2.variant
         ))
 
-    g1 = geno1.genotypes
-    g2 = geno2.genotypes
-
     # Reorder samples and round values (if dosages)
-    g1 = np.round(g1[idx1])
-    g2 = np.round(g2[idx2])
+    g1 = _take_round(geno1.genotypes, idx1, g1_buf)
+    g2 = _take_round(geno2.genotypes, idx2, g2_buf)
     assert g1.shape == g2.shape
 
+    if NUMBA_AVAILABLE:
+        counts = _count_numba(g1, g2)
+    else:
+        counts = _count(g1, g2)
+
+    return dict(zip(_COUNT_KEYS, counts))
+
+
+def _take_round(genotypes, idx, out=None):
+    """Reorders and rounds the genotypes (in the buffer, if provided)."""
+    if out is None:
+        return np.round(genotypes[idx])
+
+    if genotypes.dtype == out.dtype:
+        # The indices are always valid, so there is no need to buffer the
+        # values (which is what the default 'raise' mode does)
+        np.take(genotypes, idx, out=out, mode="clip")
+    else:
+        out[:] = genotypes[idx]
+
+    return np.round(out, out=out)
+
+
+def _count(g1, g2):
+    """Counts the matches, mismatches and missing calls of two vectors.
+
+    Args:
+        g1 (numpy.array): The genotypes from the first reader.
+        g2 (numpy.array): The genotypes from the second reader.
+
+    Returns:
+        tuple: The number of samples called in both vectors, the number of
+        matches and mismatches, and the number of missing calls in each
+        vector.
+
+    """
     missing_1 = np.isnan(g1)
     missing_2 = np.isnan(g2)
-    missing = missing_1 | missing_2
-
-    g1 = g1[~missing]
-    g2 = g2[~missing]
-
-    return {
-        "n": g1.shape[0],
-        "match": np.sum(g1 == g2),
-        "mismatch": np.sum(g1 != g2),
-        "missing_1": np.sum(missing_1),
-        "missing_2": np.sum(missing_2),
-    }
+    called = ~(missing_1 | missing_2)
+
+    # NaN never compares equal, so the missing calls are never a match
+    n = int(np.count_nonzero(called))
+    match = int(np.count_nonzero(g1 == g2))
+
+    return (n, match, n - match, int(np.count_nonzero(missing_1)),
+            int(np.count_nonzero(missing_2)))
+
+
+@njit(cache=True, nogil=True)
+def _count_numba(g1, g2):
+    """Numba version of _count (a single pass over the genotypes)."""
+    n = match = missing_1 = missing_2 = 0
+
+    for i in range(g1.shape[0]):
+        a = g1[i]
+        b = g2[i]
+
+        # NaN is the only value that is not equal to itself
+        if a != a or b != b:
+            missing_1 += a != a
+            missing_2 += b != b
+            continue
+
+        n += 1
+        match += a == b
+
+    return n, match, n - match, missing_1, missing_2
+
@@ -25,22 +25,38 @@
 # THE SOFTWARE.
 
 
-import urllib
 import json
+import time
+import urllib.error
+import urllib.request
+import gzip
+import shelve
 import logging
 import warnings
 from typing import List
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import pandas as pd
 
 from .core import Variant
+from ._jit import NUMBA_AVAILABLE, njit
 from . import parsers
 
 
 logger = logging.getLogger(__name__)
 
 
+# The maximal number of rsIDs per request to Ensembl's REST API
+_ENSEMBL_BATCH_SIZE = 200
+
+# The number of times a rate limited request (HTTP 429) is retried
+_ENSEMBL_MAX_RETRIES = 3
+
+# The variants already fetched from Ensembl (None if there was no mapping)
+_ensembl_cache = {}
+
+
 warnings.simplefilter("once", DeprecationWarning)
 
 
@@ -78,7 +94,9 @@ def maf(genotypes):
     """
     warnings.warn("deprecated: use 'Genotypes.maf'", DeprecationWarning)
     g = genotypes.genotypes
-    maf = np.nansum(g) / (2 * np.sum(~np.isnan(g)))
+    g = g[~np.isnan(g)]
+
+    maf = g.sum() / (2 * g.shape[0]) if g.shape[0] > 0 else np.nan
     if maf > 0.5:
         maf = 1 - maf
         return maf, False
@@ -105,7 +123,67 @@ def variants_to_df(variants: List[Variant],
     return df
 
 
-def rsids_to_variants(li):
+def rsids_to_variants(li, cache_fn=None, max_workers=4):
+    """Gets the GRCh37 variants for a list of rsIDs using Ensembl's REST API.
+
+    Args:
+        li (list): The rsIDs.
+        cache_fn (str): A shelve file caching the variants between sessions
+                        (optional).
+        max_workers (int): The maximal number of concurrent requests.
+
+    Returns:
+        dict: The variants found for the rsIDs.
+
+    Note:
+        The rsIDs are requested in batches of 200 (the maximum allowed by
+        Ensembl) and the results are cached for the session, so that each
+        rsID is requested only once. Rate limited requests are retried
+        after the delay asked by the server (Retry-After).
+
+    """
+    shelf = shelve.open(cache_fn) if cache_fn else None
+
+    try:
+        out = {}
+        to_fetch = []
+        for name in dict.fromkeys(li):
+            if name in _ensembl_cache:
+                variant = _ensembl_cache[name]
+            elif shelf is not None and name in shelf:
+                variant = _ensembl_cache[name] = shelf[name]
+            else:
+                to_fetch.append(name)
+                continue
+
+            if variant is not None:
+                out[name] = variant
+
+        batches = [
+            to_fetch[i:i + _ENSEMBL_BATCH_SIZE]
+            for i in range(0, len(to_fetch), _ENSEMBL_BATCH_SIZE)
+        ]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(_fetch_ensembl_variants, batches)
+            for batch, fetched in zip(batches, results):
+                for name in batch:
+                    # The rsIDs without mappings are cached as None
+                    variant = _ensembl_cache[name] = fetched.get(name)
+                    if shelf is not None:
+                        shelf[name] = variant
+
+                    if variant is not None:
+                        out[name] = variant
+
+    finally:
+        if shelf is not None:
+            shelf.close()
+
+    return out
+
+
+def _fetch_ensembl_variants(li):
     url = "http://grch37.rest.ensembl.org/variation/homo_sapiens"
 
     req = urllib.request.Request(
@@ -114,12 +192,30 @@ def rsids_to_variants(li):
         headers={
             "Content-type": "application/json",
             "Accept": "application/json",
+            "Accept-Encoding": "gzip",
         },
         method="POST"
     )
 
-    with urllib.request.urlopen(req) as f:
-        data = json.loads(f.read().decode("utf-8"))
+    for attempt in range(_ENSEMBL_MAX_RETRIES + 1):
+        try:
+            with urllib.request.urlopen(req) as f:
+                data = f.read()
+                if f.headers.get("Content-Encoding") == "gzip":
+                    data = gzip.decompress(data)
+            break
+
+        except urllib.error.HTTPError as e:
+            if e.code != 429 or attempt == _ENSEMBL_MAX_RETRIES:
+                raise
+
+            delay = _retry_after(e.headers or {})
+            logger.warning(
+                "Rate limited by Ensembl, retrying in {}s.".format(delay)
+            )
+            time.sleep(delay)
+
+    data = json.loads(data.decode("utf-8"))
 
     out = {}
     for name, info in data.items():
@@ -151,6 +247,14 @@ def rsids_to_variants(li):
     return out
 
 
+def _retry_after(headers, default=1.0):
+    # The delay is in seconds (the HTTP date form is not used by Ensembl)
+    try:
+        return max(float(headers.get("Retry-After", default)), 0)
+    except (TypeError, ValueError):
+        return default
+
+
 def genotype_to_df(g, samples, as_string=False):
     """Convert a genotype object to a pandas dataframe.
 
@@ -159,21 +263,25 @@ def genotype_to_df(g, samples, as_string=False):
 
     """
     name = g.variant.name if g.variant.name else "genotypes"
-    df = pd.DataFrame(g.genotypes, index=samples, columns=[name])
 
     if as_string:
-        df["alleles"] = None
+        # The hard calls are used to look up the alleles (the values out of
+        # range, including NaN, are missing)
+        alleles = np.array([
+            "{0}/{0}".format(g.reference),
+            "{0}/{1}".format(g.reference, g.coded),
+            "{0}/{0}".format(g.coded),
+        ], dtype=object)
 
-        hard_calls = df[name].round()
-        df.loc[hard_calls == 0, "alleles"] = "{0}/{0}".format(g.reference)
-        df.loc[hard_calls == 1, "alleles"] = "{0}/{1}".format(g.reference,
-                                                              g.coded)
-        df.loc[hard_calls == 2, "alleles"] = "{0}/{0}".format(g.coded)
+        hard_calls = np.round(g.genotypes)
+        called = (hard_calls >= 0) & (hard_calls <= 2)
 
-        df = df[["alleles"]]
-        df.columns = [name]
+        values = np.full(hard_calls.shape[0], np.nan, dtype=object)
+        values[called] = alleles[hard_calls[called].astype(np.intp)]
 
-    return df
+        return pd.DataFrame(values, index=samples, columns=[name])
+
+    return pd.DataFrame(g.genotypes, index=samples, columns=[name])
 
 
 def compute_ld(cur_geno, other_genotypes, r2=False):
@@ -194,26 +302,30 @@ def compute_ld(cur_geno, other_genotypes, r2=False):
     # Normalizing the current genotypes
     norm_cur = normalize_genotypes(cur_geno)
 
-    # Normalizing and creating the matrix for the other genotypes
-    norm_others = np.stack(
-        tuple(normalize_genotypes(g) for g in other_genotypes),
-        axis=1,
+    # Creating the matrix for the other genotypes
+    norm_others = np.empty(
+        (norm_cur.shape[0], len(other_genotypes)), dtype=np.float64,
     )
+    for j, g in enumerate(other_genotypes):
+        # Making sure the size is the same
+        genotypes = g.genotypes
+        assert genotypes.shape == norm_cur.shape
+
+        norm_others[:, j] = genotypes
 
-    # Making sure the size is the same
-    assert norm_cur.shape[0] == norm_others.shape[0]
+    # Normalizing all the markers at once (in place)
+    norm_others -= np.nanmean(norm_others, axis=0)
+    norm_others /= np.nanstd(norm_others, axis=0)
 
     # Getting the number of "samples" per marker (taking into account NaN)
-    n = (
-        ~np.isnan(norm_cur.reshape(norm_cur.shape[0], 1)) *
-        ~np.isnan(norm_others)
-    ).sum(axis=0)
+    n = np.count_nonzero(
+        ~np.isnan(norm_others) & ~np.isnan(norm_cur)[:, np.newaxis], axis=0,
+    )
 
-    # Computing r (replacing NaN by 0)
+    # Computing r (replacing NaN by 0) with a single matrix-vector product
+    np.nan_to_num(norm_others, copy=False)
     r = pd.Series(
-        np.dot(
-            np.nan_to_num(norm_cur), np.nan_to_num(norm_others) / n
-        ),
+        np.nan_to_num(norm_cur) @ norm_others / n,
         index=[g.variant.name for g in other_genotypes],
         name="r2" if r2 else "r",
     )
@@ -271,9 +383,40 @@ def normalize_genotypes(genotypes):
 
     """
     genotypes = genotypes.genotypes
+    if NUMBA_AVAILABLE:
+        return _normalize_numba(np.asarray(genotypes, dtype=np.float64))
+
     return (genotypes - np.nanmean(genotypes)) / np.nanstd(genotypes)
 
 
+@njit(cache=True, nogil=True, error_model="numpy")
+def _normalize_numba(genotypes):
+    """Numba version of normalize_genotypes (NaN are kept as is).
+
+    The mean and the variance are accumulated in a single pass (using
+    Welford's algorithm, which is stable), and the normalized values are
+    written in a second one.
+
+    """
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    for x in genotypes:
+        if x == x:
+            n += 1
+            delta = x - mean
+            mean += delta / n
+            m2 += delta * (x - mean)
+
+    std = np.sqrt(max(m2 / n, 0.0))
+
+    out = np.empty_like(genotypes)
+    for i in range(genotypes.shape[0]):
+        out[i] = (genotypes[i] - mean) / std
+
+    return out
+
+
 def add_arguments_to_parser(parser):
     """Add often used arguments to an argument parser.
 